@@ -0,0 +1,42 @@
+"""Benchmark pfor scaling: runs the same loop with 1..N worker processes.
+
+Usage: python benchmarks/pfor_bench.py [iterations] [max_workers]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from program import compile_program
+
+SOURCE = '''
+func fib(n) {
+  if n < 2 { n } el { fib(n - 1) + fib(n - 2) }
+}
+pfor (i = 0; i < ITERATIONS; i = i + 1) {
+  fib(16)
+}
+'''
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    program = compile_program(SOURCE.replace('ITERATIONS', str(iterations)))
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        result = program.run(workers=workers)
+        elapsed = time.perf_counter() - start
+        if not result.ok:
+            raise result.error
+        if baseline is None:
+            baseline = elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,122 @@
-from langParser import FunctionCall, FunctionDefinition, LengthFunction, LoopStatement, Input, ReturnStatement
+from langParser import FunctionCall, FunctionDefinition, LengthFunction, LoopStatement, ParallelLoopStatement, Input, ReturnStatement, Checkpoint
 from langParser import Number, Decimal, String, Character, Boolean, Variable, TypedVariable, TypedAssignment, BinOp, Assignment, Print, IfStatement
+from limits import Limits, ResourceLimitError, value_size
+from parallel import run_parallel_loop
+from tiering import DEFAULT_TIER_THRESHOLD, compile_function, compile_loop
+
+import sys
+import time
 
 
 class Interpreter:
-    def __init__(self):
-        self.variables = {}  # Global variables
+    # pfor loops may run on a process pool; subclasses that must see every
+    # iteration in this process turn it off
+    pfor_on_pool = True
+
+    def __init__(self, output=None, inputs=None, variables=None, limits=None, workers=None,
+                 tier_threshold=DEFAULT_TIER_THRESHOLD):
+        self.variables = dict(variables) if variables else {}  # Global variables
         self.functions = {}  # Store function definitions
+        self.scopes = []  # Variables of the callers of the running function
+        self.output = output  # Stream for drucken, None means sys.stdout
+        self.inputs = iter(inputs) if inputs is not None else None  # Values for eingabe
+        self.inputs_read = 0  # eingabe values read so far
+        self.workers = workers  # Processes for pfor loops, None means one per CPU
+        self.pool = None  # LoopPool for pfor loops, started on first use
+
+        # Resource limits. Loop back-edges and function entries decrement
+        # self.fuel, and the limits are only checked when it runs out.
+        self.limits = limits if limits is not None else Limits()
+        self.max_depth = self.limits.max_depth if self.limits.max_depth is not None else sys.maxsize
+        self.max_memory = self.limits.max_memory
+        self.steps = 0  # Steps used by the slices before the current one
+        self.depth = 0
+        self.reset_fuel()
+
+        # Tiered execution. Functions called tier_threshold times, and loops
+        # that have run that many iterations, are compiled into closures
+        # that are used from their next entry on. None disables compiling.
+        if tier_threshold is not None and tier_threshold < 1:
+            raise ValueError("tier_threshold must be at least 1")
+        self.tier_threshold = tier_threshold
+        self.call_counts = {}  # FunctionDefinition -> number of calls, only counted with tiering
+        self.loop_counts = {}  # LoopStatement -> iterations run by the interpreter
+        self.compiled = {}  # FunctionDefinition or LoopStatement -> compiled closure
+
+    def reset_fuel(self):
+        """Start counting steps and time from zero"""
+        self.steps = 0
+        self.started = time.monotonic()
+        self.slice = self.next_slice()
+        self.fuel = self.slice
+
+    def next_slice(self):
+        """Number of steps until the limits have to be checked again"""
+        limits = self.limits
+        if limits.max_steps is None and limits.max_time is None and limits.max_memory is None:
+            return sys.maxsize
+        if limits.max_steps is None:
+            return limits.check_interval
+        # Stop one step past the limit so that step is the one that fails
+        return max(1, min(limits.check_interval, limits.max_steps + 1 - self.steps))
+
+    def refuel(self):
+        """Called when self.fuel runs out: check the limits and start a new slice"""
+        limits = self.limits
+        self.steps += self.slice
+        self.slice = self.fuel = 0
+        if limits.max_steps is not None and self.steps > limits.max_steps:
+            raise ResourceLimitError('steps', self.steps, limits.max_steps)
+        if limits.max_time is not None:
+            elapsed = time.monotonic() - self.started
+            if elapsed > limits.max_time:
+                raise ResourceLimitError('time', round(elapsed, 3), limits.max_time)
+        if limits.max_memory is not None:
+            used = self.memory_used()
+            if used > limits.max_memory:
+                raise ResourceLimitError('memory', used, limits.max_memory)
+        self.slice = self.next_slice()
+        self.fuel = self.slice
+
+    def steps_used(self):
+        """Steps used since the run started"""
+        return self.steps + self.slice - self.fuel
+
+    def memory_used(self):
+        """Approximate memory held by strings and lists in all live scopes"""
+        total = 0
+        for scope in self.scopes + [self.variables]:
+            for value in scope.values():
+                total += value_size(value)
+        return total
         
+    def check_concat(self, left, right):
+        """Fail before concatenating strings longer than the memory limit"""
+        if isinstance(left, str) and isinstance(right, str) and len(left) + len(right) > self.max_memory:
+            raise ResourceLimitError('memory', len(left) + len(right), self.max_memory)
+
+    def check_repeat(self, left, right):
+        """Fail before building a repeated string longer than the memory limit"""
+        if isinstance(left, str) or isinstance(right, str):
+            text, count = (left, right) if isinstance(left, str) else (right, left)
+            if isinstance(count, int) and len(text) * count > self.max_memory:
+                raise ResourceLimitError('memory', len(text) * count, self.max_memory)
+
+    def check_type(self, type_name, name, value):
+        """Check a value assigned to a typed variable, returning the value to store"""
+        if type_name == 'num ' and not isinstance(value, int):
+            raise TypeError(f"Cannot assign {type(value)} to num variable '{name}'")
+        elif type_name == 'dec' and not (isinstance(value, float) or isinstance(value, int)):
+            # Integers are allowed in decimal variables
+            raise TypeError(f"Cannot assign {type(value)} to dec variable '{name}'")
+        elif type_name == 'str' and not isinstance(value, str):
+            raise TypeError(f"Cannot assign {type(value)} to str variable '{name}'")
+        elif type_name == 'chr' and (not isinstance(value, str) or len(value) != 1):
+            raise TypeError(f"Cannot assign {type(value)} to chr variable '{name}'")
+        elif type_name == 'bool' and not isinstance(value, bool):
+            raise TypeError(f"Cannot assign {type(value)} to bool variable '{name}'")
+        return value
+
     def call_function(self, name, args):
         # Handle built-in functions
         if name == "to_num":
@@ -34,9 +144,26 @@ class Interpreter:
         
         if len(args) != len(func_def.parameters):
             raise TypeError(f"Function {name} expected {len(func_def.parameters)} arguments, got {len(args)}")
-            
+
+        self.fuel -= 1
+        if self.fuel <= 0:
+            self.refuel()
+        if self.depth >= self.max_depth:
+            raise ResourceLimitError('depth', self.depth + 1, self.max_depth)
+
+        compiled = None
+        if self.tier_threshold is not None:
+            # Without tiering (as in traced runs) nothing is compiled, so calls aren't counted
+            calls = self.call_counts.get(func_def, 0) + 1
+            self.call_counts[func_def] = calls
+            compiled = self.compiled.get(func_def)
+            if calls == self.tier_threshold:
+                # Hot function: compile it for the next call
+                self.compiled[func_def] = compile_function(func_def)
+
         # Create a new scope for function variables
-        old_variables = self.variables.copy()
+        self.scopes.append(self.variables)
+        self.depth += 1
         
         # Set up parameters in the function scope
         self.variables = {}
@@ -46,14 +173,14 @@ class Interpreter:
         # Execute function body
         result = None
         try:
-            for statement in func_def.body:
-                result = self.evaluate(statement)
-                # If we hit a return statement, exit early
-                if isinstance(statement, ReturnStatement):
-                    break
+            if compiled is not None:
+                result = compiled(self)
+            else:
+                result = self.execute_function_body(func_def.body)
         finally:
-            # Restore global scope when function ends
-            self.variables = old_variables
+            # Restore the caller's scope when function ends
+            self.variables = self.scopes.pop()
+            self.depth -= 1
             
         return result    
 
@@ -108,24 +235,7 @@ class Interpreter:
             return None
             
         elif isinstance(node, TypedAssignment):
-            value = self.evaluate(node.expr)
-            
-            # Type checking
-            if node.type_name == 'num ' and not isinstance(value, int):
-                raise TypeError(f"Cannot assign {type(value)} to num variable '{node.name}'")
-            elif node.type_name == 'dec' and not (isinstance(value, float) or isinstance(value, int)):
-                # Allow integers to be assigned to decimal variables
-                if isinstance(value, int):
-                    value = float(value)  # Convert int to float
-                else:
-                    raise TypeError(f"Cannot assign {type(value)} to dec variable '{node.name}'")
-            elif node.type_name == 'str' and not isinstance(value, str):
-                raise TypeError(f"Cannot assign {type(value)} to str variable '{node.name}'")
-            elif node.type_name == 'chr' and (not isinstance(value, str) or len(value) != 1):
-                raise TypeError(f"Cannot assign {type(value)} to chr variable '{node.name}'")
-            elif node.type_name == 'bool' and not isinstance(value, bool):
-                raise TypeError(f"Cannot assign {type(value)} to bool variable '{node.name}'")
-                
+            value = self.check_type(node.type_name, node.name, self.evaluate(node.expr))
             self.variables[node.name] = value
             return value
 
@@ -139,10 +249,14 @@ class Interpreter:
             right = self.evaluate(node.right)
 
             if node.op == '+':
+                if self.max_memory is not None:
+                    self.check_concat(left, right)
                 return left + right
             if node.op == '-':
                 return left - right
             if node.op == '*':
+                if self.max_memory is not None:
+                    self.check_repeat(left, right)
                 return left * right
             if node.op == '/':
                 if right == 0:
@@ -170,7 +284,7 @@ class Interpreter:
 
         elif isinstance(node, Print):
             value = self.evaluate(node.expr)
-            print(value)
+            print(value, file=self.output)
             return value
         
         elif isinstance(node, Input):
@@ -178,13 +292,13 @@ class Interpreter:
             prompt = ""
             if node.prompt is not None:
                 prompt = node.prompt
-                print(prompt, end='')
+                print(prompt, end='', file=self.output)
             
             # Get the input type if provided (defaults to string)
             input_type = node.input_type if hasattr(node, 'input_type') else 'str'
             
             # Get user input
-            user_input = input()
+            user_input = self.read_input()
             
             # Convert the input based on the specified type
             if input_type == 'num ':
@@ -218,10 +332,30 @@ class Interpreter:
             return self.execute_block(node.else_body) if node.else_body else None
 
         elif isinstance(node, LoopStatement):
+            compiled = self.compiled.get(node)
+            if compiled is not None:
+                return compiled(self)
             self.evaluate(node.init)
+            iterations = 0
             while self.evaluate(node.condition):
                 self.execute_block(node.body)
                 self.evaluate(node.update)
+                iterations += 1
+                self.fuel -= 1
+                if self.fuel <= 0:
+                    self.refuel()
+            iterations += self.loop_counts.get(node, 0)
+            self.loop_counts[node] = iterations
+            if self.tier_threshold is not None and iterations >= self.tier_threshold:
+                # Hot loop: compile it for the next time it is entered
+                self.compiled[node] = compile_loop(node)
+            return None
+
+        elif isinstance(node, ParallelLoopStatement):
+            return run_parallel_loop(self, node)
+
+        elif isinstance(node, Checkpoint):
+            # Only marks where a snapshot is taken, see snapshot.py
             return None
 
         elif isinstance(node, LengthFunction):
@@ -233,6 +367,40 @@ class Interpreter:
         else:
             raise TypeError(f"Unknown node type: {type(node)}")
 
+    def read_input(self):
+        """Read one line of input, from the supplied inputs if any"""
+        if self.inputs is None:
+            value = input()
+        else:
+            try:
+                value = str(next(self.inputs))
+            except StopIteration:
+                raise EOFError("No more input available for eingabe")
+        self.inputs_read += 1
+        return value
+
+    def close(self):
+        """Shut down the pfor process pool, if one was started"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def function_tiers(self):
+        """Return (name, calls, tier) for each defined function. Calls are only counted with tiering."""
+        return [(name, self.call_counts.get(func_def, 0),
+                 'compiled' if func_def in self.compiled else 'interpreted')
+                for name, func_def in self.functions.items()]
+
+    def execute_function_body(self, statements):
+        """Execute a function body, stopping after a top-level return"""
+        result = None
+        for statement in statements:
+            result = self.evaluate(statement)
+            # If we hit a return statement, exit early
+            if isinstance(statement, ReturnStatement):
+                break
+        return result
+
     def execute_block(self, statements):
         """Execute a block of statements"""
         if statements is None:
@@ -245,6 +413,7 @@ class Interpreter:
 
     def run(self, ast):
         """Run the program represented by the AST"""
+        self.reset_fuel()
         result = None
         for node in ast:
             result = self.evaluate(node)
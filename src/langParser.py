@@ -126,6 +126,17 @@ class LoopStatement(Node):
         return f"LoopStatement({self.init}, {self.condition}, {self.update}, {self.body})"
 
 
+class ParallelLoopStatement(Node):
+    def __init__(self, init, condition, update, body):
+        self.init = init
+        self.condition = condition
+        self.update = update
+        self.body = body
+
+    def __repr__(self):
+        return f"ParallelLoopStatement({self.init}, {self.condition}, {self.update}, {self.body})"
+
+
 class FunctionCall(Node):
     def __init__(self, name, args):
         self.name = name
@@ -153,6 +164,11 @@ class ReturnStatement(Node):
         return f"ReturnStatement({self.expr})"    
 
 
+class Checkpoint(Node):
+    def __repr__(self):
+        return "Checkpoint()"
+
+
 class LengthFunction(Node):
     def __init__(self, expr):
         self.expr = expr
@@ -161,10 +177,35 @@ class LengthFunction(Node):
         return f"LengthFunction({self.expr})"
 
 
+def walk(nodes):
+    """Yield every node in a list of statements, parents before children"""
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        yield node
+        children = []
+        for value in vars(node).values():
+            if isinstance(value, Node):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, Node))
+        stack.extend(reversed(children))
+
+
+def constant(pool, node_type, value):
+    """Return the literal node for a value from a pool dict, adding it if missing"""
+    key = (node_type, type(value), value)
+    node = pool.get(key)
+    if node is None:
+        node = pool[key] = node_type(value)
+    return node
+
+
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
         self.pos = 0
+        self.constants = {}  # Literal nodes, shared by all uses of the same literal
         if tokens:
             self.current_token = self.tokens[0]
         else:
@@ -189,6 +230,10 @@ class Parser:
         raise SyntaxError(
             f"Expected {expected_type}, got {self.current_token[0]} ('{self.current_token[1]}') at position {self.pos}")
 
+    def constant(self, node_type, value):
+        """Return the shared literal node for a value"""
+        return constant(self.constants, node_type, value)
+
     def parse_expression(self):
         """Parse expressions including comparison operators"""
         left = self.parse_additive()
@@ -225,24 +270,24 @@ class Parser:
 
         if token_type == 'NUMBER':
             self.advance()
-            return Number(token_value)
+            return self.constant(Number, token_value)
             
         elif token_type == 'DECIMAL':
             self.advance()
-            return Decimal(token_value)
+            return self.constant(Decimal, token_value)
             
         elif token_type == 'BOOL_TRUE' or token_type == 'BOOL_FALSE':
             value = True if token_type == 'BOOL_TRUE' else False
             self.advance()
-            return Boolean(value)
+            return self.constant(Boolean, value)
 
         elif token_type == 'STRING':
             value = token_value
             self.advance()
             # Check if it's a single character
             if len(value) == 1:
-                return Character(value)
-            return String(value)
+                return self.constant(Character, value)
+            return self.constant(String, value)
         
         elif token_type == 'INPUT':
             self.advance()
@@ -350,6 +395,10 @@ class Parser:
             body = self.parse_block()
             return FunctionDefinition(func_name, parameters, body)
         
+        elif self.current_token[0] == 'CHECKPOINT':
+            self.advance()
+            return Checkpoint()
+        
         elif self.current_token[0] == 'RETURN':
             self.advance()
             expr = self.parse_expression()
@@ -372,7 +421,8 @@ class Parser:
                 else_body = self.parse_block()
             return IfStatement(condition, body, else_body)
             
-        elif self.current_token[0] == 'FOR':
+        elif self.current_token[0] in ('FOR', 'PFOR'):
+            parallel = self.current_token[0] == 'PFOR'
             self.advance()
             self.consume('LPAREN')
             init = self.parse_statement()  # Initialization (e.g., i = 0)
@@ -382,6 +432,15 @@ class Parser:
             update = self.parse_statement()  # Update (e.g., i = i + 1)
             self.consume('RPAREN')
             body = self.parse_block()  # Body of the loop
+            if parallel:
+                # Iterations may run in other processes, where input can't be
+                # read and new functions wouldn't reach this one
+                for node in walk(body):
+                    if isinstance(node, Input):
+                        raise SyntaxError("eingabe cannot be used in a pfor body")
+                    if isinstance(node, FunctionDefinition):
+                        raise SyntaxError("func cannot be defined in a pfor body")
+                return ParallelLoopStatement(init, condition, update, body)
             return LoopStatement(init, condition, update, body)
             
         elif self.current_token[0] in ('TYPE_NUM', 'TYPE_STR', 'TYPE_DEC', 'TYPE_CHR', 'TYPE_BOOL'):
@@ -5,6 +5,7 @@ TOKEN_SPEC = [
     ('IF',        r'if'),                # If statement
     ('ELF',       r'elf'),               # Else if statement
     ('ELSE',      r'el'),                # Else statement
+    ('PFOR',      r'pfor\b'),           # parallel for loop
     ('FOR',       r'for'),               # for loop
     ('INPUT',     r'eingabe'),          # Input function
     ('FUNCTION',  r'func'),              # Function declaration
@@ -17,6 +18,7 @@ TOKEN_SPEC = [
     ('BOOL_FALSE',r'false'),             # Boolean false value
     ('DECIMAL',   r'\d+\.\d+'),          # Decimal number (must be before NUMBER)
     ('RETURN',    r'return'),            # Return statement
+    ('CHECKPOINT',r'checkpoint\b'),     # Snapshot point for warm starts
     ('COMMA',     r','),                 # Comma for separating parameters
     ('EQ',        r'=='),                # Equals (must be before ASSIGN)
     ('NEQ',       r'!='),                # Not Equals
@@ -42,7 +44,30 @@ TOKEN_SPEC = [
 ]
 
 
-def tokenize(code):
+class SymbolTable:
+    """Table of identifiers used while lexing one program.
+
+    Every occurrence of the same identifier gets the same string object, so
+    the program holds one copy of each and dictionary lookups by name
+    succeed on the identity check. Literals are shared by the parser, which
+    keeps one node per distinct value. The table itself is only needed
+    while compiling.
+    """
+
+    def __init__(self):
+        self.names = {}  # name -> canonical string
+
+    def intern(self, name):
+        """Return the canonical string for an identifier"""
+        return self.names.setdefault(name, name)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def tokenize(code, symbols=None):
+    if symbols is None:
+        symbols = SymbolTable()
     tokens = []
     pos = 0
     while pos < len(code):
@@ -67,6 +92,8 @@ def tokenize(code):
                     tokens.append((token_type, False))
                 elif token_type in ('SKIP', 'NEWLINE'):
                     pass  # Ignore spaces and newlines
+                elif token_type == 'IDENT':
+                    tokens.append((token_type, symbols.intern(text)))
                 else:
                     tokens.append((token_type, text))
                 pos += len(text)
@@ -0,0 +1,50 @@
+import sys
+
+
+class ResourceLimitError(RuntimeError):
+    """Raised when a program exceeds one of its resource limits"""
+
+    def __init__(self, limit, used, maximum):
+        self.limit = limit  # 'steps', 'time', 'depth' or 'memory'
+        self.used = used
+        self.maximum = maximum
+        super().__init__(f"Resource limit exceeded: {limit} used {used}, limit is {maximum}")
+
+
+class Limits:
+    """Resource limits for one program run. None means unlimited.
+
+    max_steps  -- loop iterations plus function calls
+    max_time   -- wall time in seconds
+    max_depth  -- nesting depth of user function calls
+    max_memory -- approximate bytes held by strings and lists in variables
+
+    Time and memory are only checked every check_interval steps.
+    """
+
+    def __init__(self, max_steps=None, max_time=None, max_depth=None, max_memory=None, check_interval=1024):
+        if check_interval < 1:
+            raise ValueError("check_interval must be at least 1")
+        self.max_steps = max_steps
+        self.max_time = max_time
+        self.max_depth = max_depth
+        self.max_memory = max_memory
+        self.check_interval = check_interval
+
+    @property
+    def enabled(self):
+        """True if any limit is set"""
+        return any(limit is not None for limit in (self.max_steps, self.max_time, self.max_depth, self.max_memory))
+
+    def __repr__(self):
+        return (f"Limits(max_steps={self.max_steps}, max_time={self.max_time}, "
+                f"max_depth={self.max_depth}, max_memory={self.max_memory})")
+
+
+def value_size(value):
+    """Approximate memory used by a variable value"""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(value_size(item) for item in value)
+    return 0
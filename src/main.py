@@ -1,73 +1,126 @@
 import sys
 import os
-from lexer import tokenize
-from langParser import Parser
-from langInterpreter import Interpreter
+import traceback
+from limits import Limits
+from program import compile_program
+from tiering import DEFAULT_TIER_THRESHOLD
+from memreport import MemoryReport
+from tracing import Tracer, ConsoleSink, JsonLinesSink, PHASE_EVENTS
 
 def show_usage():
     print("Usage: python main2.py <filename.lip> [--debug=true] [--version] [--help]")
     print("\nOptions:")
-    print("  --debug=true   Enable debug mode to show detailed execution steps")
+    print("  --debug=true   Enable debug mode to show phases, variables and function tiers")
+    print("  --trace=FILE   Write execution events to FILE as JSON lines")
+    print("  --trace-functions=a,b  Only trace execution inside these functions")
+    print("  --trace-sample=R  Keep a fraction R of statement and variable events")
+    print("  --max-steps=N  Stop after N loop iterations and function calls")
+    print("  --max-time=S   Stop after S seconds")
+    print("  --max-depth=N  Limit function call nesting to N")
+    print("  --max-memory=B Limit strings held in variables to about B bytes")
+    print("  --workers=N    Run pfor loops on N processes (1 runs them serially)")
+    print("  --parallel-parse  Lex and parse top-level functions on --workers processes")
+    print("  --tier-threshold=N  Compile functions and loops after N calls or iterations (0 never compiles)")
+    print("  --mem          Report memory use per phase, token and node counts and the biggest variables")
+    print("  --free-source  Free the source text before running (tokens are always freed after parsing)")
+    print("  --snapshot=FILE  Restore the state at the script's checkpoint from FILE, or save it there")
     print("  --version      Show the interpreter version")
     print("  --help         Display this help message")
 
 def show_version():
     print("Lang27 v0.0.3")
 
-def run_code(code, debug=False):
+def get_option(name, convert=str):
+    """Return the value of a --name=value argument, or None if it is absent"""
+    prefix = f"--{name}="
+    for arg in sys.argv:
+        if arg.startswith(prefix):
+            return convert(arg[len(prefix):])
+    return None
+
+def make_tracer(debug=False, trace_path=None, trace_functions=None, trace_sample=None, mem_report=None):
+    """Build the Tracer for the command line options and the trace file sink to close after the run.
+
+    Returns (None, None) if nothing is traced.
+    """
+    if not debug and trace_path is None and mem_report is None:
+        return None, None
+    tracer = Tracer(sample_rate=trace_sample if trace_sample is not None else 1.0,
+                    functions=trace_functions)
+    sink = None
+    if debug:
+        tracer.add_hook(ConsoleSink(), events=PHASE_EVENTS + ('error',))
+    if trace_path is not None:
+        sink = JsonLinesSink(open(trace_path, 'w'))
+        tracer.add_hook(sink)
+    if mem_report is not None:
+        tracer.add_hook(mem_report, events=PHASE_EVENTS)
+    return tracer, sink
+
+def run_code(code, debug=False, limits=None, workers=None, tier_threshold=DEFAULT_TIER_THRESHOLD, tracer=None,
+             mem_report=None, free_source=False, parallel_parse=False, snapshot_path=None):
     """Run a program written in our custom language"""
     try:
-        if debug:
-            print("Starting lexical analysis...")
-        
-        tokens = tokenize(code)
-        
-        if debug:
-            print("Tokens generated:")
-            for i, token in enumerate(tokens):
-                print(f"  {i}: {token}")
-        
-        if debug:
-            print("\nStarting parsing...")
-        
-        parser = Parser(tokens)
-        ast = parser.parse()
-        
-        if debug:
-            print("AST generated:")
-            for i, node in enumerate(ast):
-                print(f"  {i}: {node}")
-        
-        if debug:
-            print("\nStarting interpretation...")
-        
-        interpreter = Interpreter()
-        result = interpreter.run(ast)
-        
-        if debug:
-            print(f"\nFinal result: {result}")
-            print("Final variable values:")
-            for var, value in interpreter.variables.items():
-                print(f"  {var} = {value}")
-        
-        return result
+        program = compile_program(code, tracer, parallel_parse, workers)
     except Exception as e:
         print(f"Error: {e}")
         if debug:
-            import traceback
             traceback.print_exc()
         return None
 
-def run_file(file_path, debug=False):
+    if debug:
+        print(f"Top-level statements parsed: {len(program.ast)}")
+    if mem_report is not None:
+        mem_report.count_nodes(program.ast)
+    if free_source:
+        # Nothing below needs the source, let it be freed before running;
+        # compile_program already dropped the tokens after parsing
+        code = None
+
+    result = program.run(inputs=sys.stdin, output=sys.stdout, limits=limits, workers=workers,
+                         tier_threshold=tier_threshold, tracer=tracer, snapshot=snapshot_path)
+    if not result.ok:
+        print(f"Error: {result.error}")
+        if debug:
+            traceback.print_exception(type(result.error), result.error, result.error.__traceback__)
+        return None
+
+    if result.snapshot_error is not None:
+        print(f"Warning: {result.snapshot_error}")
+    if debug:
+        if result.restored is not None and result.snapshot_error is None:
+            print(f"Snapshot {'restored from' if result.restored else 'written to'} {snapshot_path}")
+        print(f"\nFinal result: {result.value}")
+        print("Final variable values:")
+        for var, value in result.variables.items():
+            print(f"  {var} = {value}")
+        print("Function tiers:")
+        for name, calls, tier in result.function_tiers:
+            # Calls are only counted when tiering is on
+            print(f"  {name}: {tier} ({calls} calls)" if tier_threshold is not None else f"  {name}: {tier}")
+        compiled_loops, run_loops = result.loops
+        print(f"Loops compiled: {compiled_loops} of {run_loops} run")
+    if mem_report is not None:
+        mem_report.measure_variables(result.variables)
+        print(mem_report.format())
+
+    return result.value
+
+def read_source(file_path):
+    with open(file_path, 'r') as file:
+        return file.read()
+
+def run_file(file_path, debug=False, limits=None, workers=None, tier_threshold=DEFAULT_TIER_THRESHOLD, tracer=None,
+             mem_report=None, free_source=False, parallel_parse=False, snapshot_path=None):
     """Run a program from a .lip file"""
     if not file_path.endswith('.lip'):
         print(f"Error: File must have a .lip extension, got '{file_path}'")
         return None
     
     try:
-        with open(file_path, 'r') as file:
-            code = file.read()
-        return run_code(code, debug)
+        # The source is passed straight through, so run_code holds the only reference
+        return run_code(read_source(file_path), debug, limits, workers, tier_threshold, tracer,
+                        mem_report, free_source, parallel_parse, snapshot_path)
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found")
         return None
@@ -87,6 +140,37 @@ if __name__ == "__main__":
         
         file_path = sys.argv[1]
         debug_mode = any(arg == "--debug=true" for arg in sys.argv)
-        run_file(file_path, debug=debug_mode)
+        try:
+            limits = Limits(max_steps=get_option("max-steps", int),
+                            max_time=get_option("max-time", float),
+                            max_depth=get_option("max-depth", int),
+                            max_memory=get_option("max-memory", int))
+            workers = get_option("workers", int)
+            tier_threshold = get_option("tier-threshold", int)
+            if tier_threshold is None:
+                tier_threshold = DEFAULT_TIER_THRESHOLD
+            elif tier_threshold == 0:
+                tier_threshold = None
+            elif tier_threshold < 0:
+                raise ValueError("--tier-threshold must be 0 or more")
+            mem_report = MemoryReport() if "--mem" in sys.argv else None
+            free_source = "--free-source" in sys.argv
+            parallel_parse = "--parallel-parse" in sys.argv
+            trace_functions = get_option("trace-functions")
+            tracer, trace_sink = make_tracer(debug=debug_mode, trace_path=get_option("trace"),
+                                             trace_functions=trace_functions.split(",") if trace_functions else None,
+                                             trace_sample=get_option("trace-sample", float), mem_report=mem_report)
+        except (ValueError, OSError) as e:
+            print(f"Error: Invalid option: {e}")
+            sys.exit(1)
+        if mem_report is not None:
+            mem_report.start()
+        try:
+            run_file(file_path, debug=debug_mode, limits=limits, workers=workers, tier_threshold=tier_threshold,
+                     tracer=tracer, mem_report=mem_report, free_source=free_source, parallel_parse=parallel_parse,
+                     snapshot_path=get_option("snapshot"))
+        finally:
+            if trace_sink is not None:
+                trace_sink.close()
     else:
         show_usage()
@@ -0,0 +1,83 @@
+import sys
+import tracemalloc
+from collections import Counter
+
+from langParser import walk
+
+
+def deep_size(value):
+    """Approximate bytes held by a value, including list items"""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(deep_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}"
+
+
+class MemoryReport:
+    """Collects memory usage per phase with tracemalloc.
+
+    Register it as a tracer hook for phase events; it resets the peak when a
+    phase starts and records retained and peak memory when it ends.
+    """
+
+    def __init__(self, top_variables=10):
+        self.top_variables = top_variables
+        self.phases = []  # (phase, retained bytes, peak bytes)
+        self.token_counts = None  # None until a lex phase reports them
+        self.node_counts = Counter()
+        self.variables = []  # (name, bytes), biggest first
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def __call__(self, event):
+        if event['event'] == 'phase_start':
+            tracemalloc.reset_peak()
+        elif event['event'] == 'phase_end':
+            retained, peak = tracemalloc.get_traced_memory()
+            self.phases.append((event['phase'], retained, peak))
+            if 'tokens' in event:
+                self.count_tokens(event['tokens'])
+
+    def count_tokens(self, counts):
+        """Record token counts by type, as in the lex phase_end event"""
+        self.token_counts = Counter(counts)
+
+    def count_nodes(self, ast):
+        self.node_counts = Counter(type(node).__name__ for node in walk(ast))
+
+    def measure_variables(self, variables):
+        sizes = [(name, deep_size(value)) for name, value in variables.items()]
+        sizes.sort(key=lambda item: item[1], reverse=True)
+        self.variables = sizes[:self.top_variables]
+
+    def format(self):
+        lines = ["Memory report", "  Phase        Retained        Peak"]
+        for phase, retained, peak in self.phases:
+            lines.append(f"  {phase:<10} {format_bytes(retained):>10} {format_bytes(peak):>11}")
+        if self.token_counts is None:
+            # No lex phase ran here, as with --parallel-parse
+            lines.append("  Tokens: not available")
+        else:
+            lines.append(f"  Tokens: {sum(self.token_counts.values())}")
+            for token_type, count in self.token_counts.most_common():
+                lines.append(f"    {token_type:<12} {count:>8}")
+        lines.append(f"  AST nodes: {sum(self.node_counts.values())}")
+        for node_type, count in self.node_counts.most_common():
+            lines.append(f"    {node_type:<22} {count:>8}")
+        lines.append("  Biggest variables at exit:")
+        for name, size in self.variables:
+            lines.append(f"    {name:<22} {format_bytes(size):>10}")
+        return "\n".join(lines)
@@ -0,0 +1,91 @@
+from langParser import FunctionCall, FunctionDefinition, LengthFunction, LoopStatement, ParallelLoopStatement, ReturnStatement
+from langParser import Number, Decimal, String, Character, Boolean, TypedAssignment, BinOp, Assignment, Print, IfStatement
+
+import operator
+
+LITERALS = (Number, Decimal, String, Character, Boolean)
+
+OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+# Longer string results are left to the interpreter, so "x" * 1000000 doesn't bloat the AST
+MAX_FOLDED_STRING = 1024
+
+
+def make_literal(value):
+    """Build the literal node the parser would have produced for a value"""
+    if isinstance(value, bool):
+        return Boolean(value)
+    if isinstance(value, int):
+        return Number(value)
+    if isinstance(value, float):
+        return Decimal(value)
+    if isinstance(value, str):
+        return Character(value) if len(value) == 1 else String(value)
+    return None
+
+
+def fold_binop(node):
+    """Replace a BinOp of two literals by its value, if it can be computed safely"""
+    if not (isinstance(node.left, LITERALS) and isinstance(node.right, LITERALS)):
+        return node
+    func = OPERATORS.get(node.op)
+    if func is None:
+        return node
+    if node.op == '/' and node.right.value == 0:
+        # Leave it for the interpreter to report at runtime
+        return node
+    left, right = node.left.value, node.right.value
+    if node.op == '*' and (isinstance(left, str) or isinstance(right, str)):
+        text, count = (left, right) if isinstance(left, str) else (right, left)
+        if isinstance(count, int) and len(text) * count > MAX_FOLDED_STRING:
+            return node
+    try:
+        value = func(left, right)
+    except Exception:
+        # Type errors are reported at runtime, exactly as before
+        return node
+    if isinstance(value, str) and len(value) > MAX_FOLDED_STRING:
+        return node
+    folded = make_literal(value)
+    return folded if folded is not None else node
+
+
+def fold(node):
+    """Fold constant expressions below a node, returning the (possibly new) node"""
+    if isinstance(node, BinOp):
+        node.left = fold(node.left)
+        node.right = fold(node.right)
+        return fold_binop(node)
+    elif isinstance(node, (Assignment, TypedAssignment, Print, ReturnStatement, LengthFunction)):
+        node.expr = fold(node.expr)
+    elif isinstance(node, FunctionCall):
+        node.args = [fold(arg) for arg in node.args]
+    elif isinstance(node, FunctionDefinition):
+        node.body = fold_constants(node.body)
+    elif isinstance(node, IfStatement):
+        node.condition = fold(node.condition)
+        node.body = fold_constants(node.body)
+        if node.else_body:
+            node.else_body = fold_constants(node.else_body)
+    elif isinstance(node, (LoopStatement, ParallelLoopStatement)):
+        node.init = fold(node.init)
+        node.condition = fold(node.condition)
+        node.update = fold(node.update)
+        node.body = fold_constants(node.body)
+    return node
+
+
+def fold_constants(statements):
+    """Fold constant expressions in a list of statements (modifies the nodes in place)"""
+    return [fold(statement) for statement in statements]
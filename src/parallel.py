@@ -0,0 +1,282 @@
+import io
+import multiprocessing
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lexer import SymbolTable, tokenize
+from langParser import Parser, Assignment, TypedAssignment, FunctionDefinition, FunctionCall, Input
+from langParser import constant, walk
+from optimizer import LITERALS
+
+# Smaller pfor loops are not worth the round trip to the process pool
+MIN_PARALLEL_ITERATIONS = 16
+
+# Chunks handed out per worker, so uneven iterations still balance out
+CHUNKS_PER_WORKER = 4
+
+# Interpreter of a pool worker, set up once by init_worker
+_worker = None
+
+
+def init_worker(functions):
+    """Pool initializer: receives the function table once per process"""
+    global _worker
+    from langInterpreter import Interpreter
+    # workers=1: a pfor nested in the body runs serially instead of starting another pool
+    _worker = Interpreter(inputs=(), workers=1)
+    _worker.functions = functions
+
+
+def run_chunk(task):
+    """Run the loop body for a chunk of loop variable values in a pool worker.
+
+    Returns the (result, output) of each iteration and, if one raised, the
+    error and the output it printed before that; later iterations are not run.
+    """
+    variables, loop_variable, body, values = task
+    results = []
+    for value in values:
+        output = io.StringIO()
+        _worker.output = output
+        try:
+            results.append((run_iteration(_worker, variables, loop_variable, body, value), output.getvalue()))
+        except Exception as e:
+            return results, (e, output.getvalue())
+    return results, None
+
+
+def pool_context():
+    """Start method for pool workers. Forking a host with other threads running can deadlock."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class LoopPool:
+    """Process pool kept for a whole run, so workers start and receive the function table once"""
+
+    def __init__(self, workers, functions):
+        self.workers = workers
+        self.functions = dict(functions)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                            initializer=init_worker, initargs=(self.functions,))
+
+    def matches(self, workers, functions):
+        return self.workers == workers and self.functions == functions
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def get_pool(interpreter, workers):
+    """The interpreter's pool, started on first use and restarted if functions were (re)defined since"""
+    pool = interpreter.pool
+    if pool is None or not pool.matches(workers, interpreter.functions):
+        if pool is not None:
+            pool.close()
+        pool = interpreter.pool = LoopPool(workers, interpreter.functions)
+    return pool
+
+
+def run_iteration(interpreter, variables, loop_variable, body, value):
+    """Run the loop body once in its own copy of the variables"""
+    saved = interpreter.variables
+    interpreter.variables = dict(variables)
+    interpreter.variables[loop_variable] = value
+    try:
+        return interpreter.execute_block(body)
+    finally:
+        interpreter.variables = saved
+
+
+def split_chunks(values, workers):
+    """Split the iteration values into contiguous chunks, keeping their order"""
+    size = max(1, -(-len(values) // (workers * CHUNKS_PER_WORKER)))
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def loop_variable_name(node):
+    """Name of the variable set by the initialization of a pfor loop"""
+    if isinstance(node.init, (Assignment, TypedAssignment)):
+        return node.init.name
+    raise TypeError("pfor loop must start with an assignment to its loop variable")
+
+
+def needs_parent(body, functions):
+    """True if a function the loop body may call reads input or defines functions.
+
+    Those only behave the same in the parent process, so such loops run serially.
+    """
+    pending = [body]
+    seen = set()
+    while pending:
+        for child in walk(pending.pop()):
+            if isinstance(child, (Input, FunctionDefinition)):
+                return True
+            if isinstance(child, FunctionCall) and child.name in functions and child.name not in seen:
+                seen.add(child.name)
+                pending.append(functions[child.name].body)
+    return False
+
+
+def run_parallel_loop(interpreter, node):
+    """Run a pfor loop and return the value of each iteration's body, in order.
+
+    The loop variable's values are computed first, exactly as a for loop
+    would. Each iteration then runs in its own copy of the variables, so
+    assignments inside the body are not visible after the loop; drucken
+    output is replayed in iteration order.
+    """
+    loop_variable = loop_variable_name(node)
+    interpreter.evaluate(node.init)
+    values = []
+    while interpreter.evaluate(node.condition):
+        values.append(interpreter.variables[loop_variable])
+        interpreter.evaluate(node.update)
+        interpreter.fuel -= 1
+        if interpreter.fuel <= 0:
+            interpreter.refuel()
+
+    workers = interpreter.workers or os.cpu_count() or 1
+    if workers > 1 and len(values) >= MIN_PARALLEL_ITERATIONS and not interpreter.limits.enabled \
+            and interpreter.pfor_on_pool and not needs_parent(node.body, interpreter.functions):
+        results = run_on_pool(interpreter, node, loop_variable, values, workers)
+        if results is not None:
+            return results
+    return [run_iteration(interpreter, interpreter.variables, loop_variable, node.body, value) for value in values]
+
+
+def run_on_pool(interpreter, node, loop_variable, values, workers):
+    """Run the iterations on the interpreter's process pool, or return None if that is not possible"""
+    variables = dict(interpreter.variables)
+    tasks = [(variables, loop_variable, node.body, chunk) for chunk in split_chunks(values, workers)]
+    try:
+        chunks = list(get_pool(interpreter, workers).executor.map(run_chunk, tasks))
+    except (BrokenProcessPool, OSError, pickle.PicklingError):
+        interpreter.close()
+        return None
+
+    # Replay the output in iteration order up to the first failing iteration,
+    # as the serial path would have printed it, and raise its error there
+    output = interpreter.output if interpreter.output is not None else sys.stdout
+    results = []
+    for chunk, failure in chunks:
+        for result, text in chunk:
+            output.write(text)
+            results.append(result)
+        if failure is not None:
+            error, text = failure
+            output.write(text)
+            raise error
+    return results
+
+
+# Parallel parsing. Top-level function definitions don't depend on each
+# other, so the source can be cut in front of any line that starts with
+# 'func' outside all braces and parentheses, and the pieces lexed and parsed
+# separately. Tokens never span lines, so such a cut never splits a token.
+
+# Smaller sources are parsed serially
+MIN_PARALLEL_SOURCE = 100000
+
+
+def bracket_depth_changes(line):
+    """Net change in brace and parenthesis depth over a line, skipping string literals"""
+    change = 0
+    quote = None
+    escaped = False
+    for char in line:
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '({':
+            change += 1
+        elif char in ')}':
+            change -= 1
+    return change
+
+
+def split_source(source, chunks):
+    """Cut the source before top-level function definitions into about `chunks` pieces of similar size"""
+    target = len(source) / chunks
+    pieces = []
+    start = 0
+    position = 0
+    depth = 0
+    for line in source.splitlines(keepends=True):
+        if depth == 0 and position - start >= target and line.lstrip().startswith('func'):
+            pieces.append(source[start:position])
+            start = position
+        depth += bracket_depth_changes(line)
+        position += len(line)
+    pieces.append(source[start:])
+    return pieces
+
+
+def parse_piece(piece):
+    """Lex and parse one piece of the source in a pool worker"""
+    return Parser(tokenize(piece)).parse()
+
+
+def reintern(ast, symbols):
+    """Make names and literal nodes from different workers share objects again.
+
+    Each worker's parser shares one node per distinct literal within its
+    piece; the pieces are joined here into one pool, as a serial parse would.
+    """
+    pool = {}  # Shared literal nodes, keyed like Parser.constants
+
+    def shared(item):
+        if isinstance(item, LITERALS):
+            return constant(pool, type(item), item.value)
+        return item
+
+    ast[:] = [shared(statement) for statement in ast]
+    for node in walk(ast):
+        for attribute, value in vars(node).items():
+            if isinstance(value, LITERALS):
+                setattr(node, attribute, shared(value))
+            elif isinstance(value, list):
+                value[:] = [shared(item) for item in value]
+        if isinstance(getattr(node, 'name', None), str):
+            node.name = symbols.intern(node.name)
+            if isinstance(node, FunctionDefinition):
+                node.parameters = [symbols.intern(name) for name in node.parameters]
+
+
+def parse_parallel(source, workers=None, symbols=None):
+    """Lex and parse source on a process pool, giving the same AST as Parser(tokenize(source)).parse().
+
+    If any piece fails, the whole source is parsed serially, so syntax errors
+    are reported exactly as usual, with positions in the original file.
+    """
+    if symbols is None:
+        symbols = SymbolTable()
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(source) >= MIN_PARALLEL_SOURCE:
+        pieces = split_source(source, workers * CHUNKS_PER_WORKER)
+        if len(pieces) > 1:
+            ast = parse_pieces(pieces, workers)
+            if ast is not None:
+                reintern(ast, symbols)
+                return ast
+    return Parser(tokenize(source, symbols)).parse()
+
+
+def parse_pieces(pieces, workers):
+    """Parse the pieces on a pool and join them in order, or return None if that fails"""
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            parsed = list(pool.map(parse_piece, pieces))
+    except Exception:
+        # Syntax errors, or a piece cut in the wrong place: fall back to a serial parse
+        return None
+    return [statement for statements in parsed for statement in statements]
@@ -0,0 +1,135 @@
+import io
+import sys
+from collections import Counter
+
+from lexer import SymbolTable, tokenize
+from langParser import Parser, FunctionDefinition
+from tiering import DEFAULT_TIER_THRESHOLD
+from tracing import make_interpreter, trace_phase
+from optimizer import fold_constants
+from parallel import parse_parallel
+from snapshot import run_with_snapshot, snapshot_key, source_hash
+
+
+class RunResult:
+    """Outcome of one Program.run call"""
+
+    def __init__(self, value=None, variables=None, output=None, error=None, steps=0):
+        self.value = value  # Value of the last top-level statement
+        self.variables = variables if variables is not None else {}  # Global variables at exit
+        self.output = output  # Captured drucken output, None if an output stream was given
+        self.error = error  # Exception that stopped the program, None on success
+        self.steps = steps  # Loop iterations plus function calls executed
+        self.function_tiers = []  # (name, calls, tier) for each defined function
+        self.loops = (0, 0)  # Loops compiled, loops run
+        self.restored = None  # Whether the run resumed from a snapshot, None if none was used
+        self.snapshot_error = None  # OSError that kept the snapshot from being written, if any
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"RunResult(error={self.error!r})"
+        return f"RunResult(value={self.value!r})"
+
+
+class Program:
+    """A parsed and optimized program that can be run many times.
+
+    The AST is never modified while running, and each run gets its own
+    Interpreter, so one Program can be shared between threads.
+    """
+
+    def __init__(self, ast, digest=None):
+        self.ast = ast
+        self.digest = digest  # source_hash of the source, needed for snapshots
+        # Names of the top-level functions, in definition order
+        self.functions = tuple(node.name for node in ast if isinstance(node, FunctionDefinition))
+
+    def run(self, inputs=None, globals=None, output=None, limits=None, workers=None,
+            tier_threshold=DEFAULT_TIER_THRESHOLD, tracer=None, snapshot=None):
+        """Run the program and return a RunResult.
+
+        inputs  -- values returned by successive eingabe() calls; sys.stdin reads from the terminal
+        globals -- initial global variables
+        output  -- stream for drucken output; captured into the result when None
+        limits  -- a Limits instance; exceeding it sets result.error to a ResourceLimitError
+        workers -- processes for pfor loops, None means one per CPU and 1 runs them serially
+        tier_threshold -- calls or iterations before code is compiled, None never compiles
+        tracer  -- a Tracer receiving the execute phase and execution events
+        snapshot -- file to restore the state at the checkpoint statement from, or to save it to;
+                    it is only restored for the same globals and inputs
+        """
+        if inputs is sys.stdin:
+            inputs = None
+        elif inputs is None:
+            inputs = ()
+        elif snapshot is not None:
+            # A list, so the inputs can be part of the snapshot key
+            inputs = list(inputs)
+        stream = output if output is not None else io.StringIO()
+        result = RunResult()
+        try:
+            if snapshot is not None and self.digest is None:
+                raise ValueError("snapshots need a Program made by compile_program")
+            interpreter = make_interpreter(tracer, output=stream, inputs=inputs, variables=globals,
+                                           limits=limits, workers=workers, tier_threshold=tier_threshold)
+        except ValueError as e:
+            # Invalid arguments are reported like any other error
+            result.error = e
+            if output is None:
+                result.output = ''
+            return result
+        try:
+            with trace_phase(tracer, 'execute'):
+                if snapshot is not None:
+                    key = snapshot_key(self.digest, globals, inputs)
+                    result.value, result.restored, result.snapshot_error = run_with_snapshot(
+                        interpreter, self.ast, key, snapshot)
+                else:
+                    result.value = interpreter.run(self.ast)
+        except Exception as e:
+            result.error = e
+        finally:
+            interpreter.close()
+        result.variables = interpreter.variables
+        result.steps = interpreter.steps_used()
+        result.function_tiers = interpreter.function_tiers()
+        result.loops = (sum(1 for node in interpreter.loop_counts if node in interpreter.compiled),
+                        len(interpreter.loop_counts))
+        if output is None:
+            result.output = stream.getvalue()
+        return result
+
+    def __repr__(self):
+        return f"Program({len(self.ast)} statements, functions={list(self.functions)})"
+
+
+def compile_program(source, tracer=None, parallel_parse=False, workers=None):
+    """Lex, parse and optimize source code once, returning a reusable Program.
+
+    With parallel_parse, the source is cut before top-level function
+    definitions and lexed and parsed on a pool of `workers` processes (None
+    means one per CPU). When tracing, the lex phase_end event carries the
+    token counts by type and the parse one the number of top-level statements.
+    """
+    symbols = SymbolTable()  # Only needed while lexing; the AST keeps the interned names
+    if parallel_parse:
+        # Lexing happens in the pool workers, so there is no token list here
+        with trace_phase(tracer, 'parse') as phase:
+            ast = parse_parallel(source, workers, symbols)
+            phase['statements'] = len(ast)
+    else:
+        with trace_phase(tracer, 'lex') as phase:
+            tokens = tokenize(source, symbols)
+            if tracer is not None:
+                phase['tokens'] = dict(Counter(token_type for token_type, _ in tokens))
+        with trace_phase(tracer, 'parse') as phase:
+            ast = Parser(tokens).parse()
+            tokens = None  # Free the token list before optimizing
+            phase['statements'] = len(ast)
+    with trace_phase(tracer, 'optimize'):
+        ast = fold_constants(ast)
+    return Program(ast, source_hash(source))
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+
+from langParser import Checkpoint, FunctionDefinition, walk
+
+# Bump when the snapshot layout changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 2
+
+
+def source_hash(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def snapshot_key(digest, variables=None, inputs=None):
+    """Key a snapshot is valid for: the source hash, the initial global
+    variables and the eingabe values, which the setup may all read.
+
+    inputs is None when input comes from the terminal; see run_with_snapshot.
+    """
+    state = [digest, variables or {}, [str(value) for value in inputs] if inputs is not None else None]
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+
+def find_checkpoint(ast):
+    """Index of the first top-level checkpoint statement, or None"""
+    for index, node in enumerate(ast):
+        if isinstance(node, Checkpoint):
+            return index
+    return None
+
+
+def save_snapshot(path, interpreter, ast, key):
+    """Write the interpreter's global variables and functions to a compressed file.
+
+    Functions are stored as their position among the program's function
+    definitions, which is stable as long as the source hash matches.
+    """
+    definitions = {id(node): index for index, node in
+                   enumerate(node for node in walk(ast) if isinstance(node, FunctionDefinition))}
+    data = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'inputs_read': interpreter.inputs_read,
+        'variables': interpreter.variables,
+        'functions': {name: definitions[id(node)] for name, node in interpreter.functions.items()},
+    }
+    payload = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+    # Write to a temporary file first so a crash never leaves a broken snapshot;
+    # each run gets its own temporary file so concurrent runs don't mix writes
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    except OSError as e:
+        raise OSError(e.errno, f"Cannot write snapshot: {e.strerror}", path) from None
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(payload)
+        os.replace(temp_path, path)
+    except BaseException as e:
+        os.unlink(temp_path)
+        if isinstance(e, OSError):
+            raise OSError(e.errno, f"Cannot write snapshot: {e.strerror}", path) from None
+        raise
+
+
+def valid_snapshot(data, key, definitions):
+    """True if decoded snapshot data has the expected layout and matches the key"""
+    if not isinstance(data, dict):
+        return False
+    if data.get('version') != SNAPSHOT_VERSION or data.get('key') != key:
+        return False
+    inputs_read = data.get('inputs_read')
+    if type(inputs_read) is not int or inputs_read < 0:
+        return False
+    variables = data.get('variables')
+    functions = data.get('functions')
+    if not isinstance(variables, dict) or not isinstance(functions, dict):
+        return False
+    for index in functions.values():
+        if type(index) is not int or not 0 <= index < definitions:
+            return False
+    return True
+
+
+def load_snapshot(path, interpreter, ast, key):
+    """Restore variables and functions from a snapshot. Returns False if it is missing, stale or malformed."""
+    try:
+        with open(path, 'rb') as file:
+            data = json.loads(zlib.decompress(file.read()))
+    except (OSError, ValueError, zlib.error):
+        return False
+    definitions = [node for node in walk(ast) if isinstance(node, FunctionDefinition)]
+    if not valid_snapshot(data, key, len(definitions)):
+        return False
+    # Skip the inputs the setup read, so the rest of the program reads the same ones
+    for _ in range(data['inputs_read']):
+        interpreter.read_input()
+    interpreter.variables.update(data['variables'])
+    for name, index in data['functions'].items():
+        interpreter.functions[name] = definitions[index]
+    return True
+
+
+def run_with_snapshot(interpreter, ast, key, path):
+    """Run a program, skipping everything up to its top-level checkpoint if a
+    snapshot with this key exists, and writing one otherwise.
+
+    key is the snapshot_key of the program's source, globals and inputs. A
+    setup that reads input from the terminal can't be keyed, so no snapshot
+    is written for it. A snapshot is only a cache: if it can't be written,
+    the rest of the program still runs. Returns (result, restored, error):
+    restored is True if the snapshot was used, False if one was written (or
+    attempted) and None if none was used, as without a checkpoint; error is
+    the OSError that kept the snapshot from being written.
+    """
+    checkpoint = find_checkpoint(ast)
+    if checkpoint is None:
+        return interpreter.run(ast), None, None
+    if load_snapshot(path, interpreter, ast, key):
+        return interpreter.run(ast[checkpoint + 1:]), True, None
+    interpreter.run(ast[:checkpoint])
+    if interpreter.inputs is None and interpreter.inputs_read > 0:
+        return interpreter.execute_block(ast[checkpoint + 1:]), None, None
+    error = None
+    try:
+        save_snapshot(path, interpreter, ast, key)
+    except OSError as e:
+        error = e
+    return interpreter.execute_block(ast[checkpoint + 1:]), False, error
@@ -0,0 +1,188 @@
+from langParser import FunctionCall, LengthFunction, LoopStatement, ReturnStatement
+from langParser import Number, Decimal, String, Character, Boolean, Variable, TypedAssignment, BinOp, Assignment, Print, IfStatement
+
+import operator
+
+# Calls of a function, or iterations of a loop, before it is compiled
+DEFAULT_TIER_THRESHOLD = 1000
+
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+# Compiled code is a tree of closures that take the Interpreter and behave
+# exactly like Interpreter.evaluate on the node they were built from. Nodes
+# without a compiled form fall back to evaluate.
+
+
+def compile_node(node):
+    """Compile an AST node into a closure taking the interpreter"""
+    if isinstance(node, (Number, Decimal, String, Character, Boolean)):
+        value = node.value
+        return lambda it: value
+
+    elif isinstance(node, Variable):
+        name = node.name
+
+        def variable(it):
+            try:
+                return it.variables[name]
+            except KeyError:
+                raise NameError(f"Undefined variable: '{name}'") from None
+        return variable
+
+    elif isinstance(node, BinOp):
+        return compile_binop(node)
+
+    elif isinstance(node, Assignment):
+        name = node.name
+        expr = compile_node(node.expr)
+
+        def assignment(it):
+            value = expr(it)
+            it.variables[name] = value
+            return value
+        return assignment
+
+    elif isinstance(node, TypedAssignment):
+        name = node.name
+        type_name = node.type_name
+        expr = compile_node(node.expr)
+
+        def typed_assignment(it):
+            value = it.check_type(type_name, name, expr(it))
+            it.variables[name] = value
+            return value
+        return typed_assignment
+
+    elif isinstance(node, Print):
+        expr = compile_node(node.expr)
+
+        def print_value(it):
+            value = expr(it)
+            print(value, file=it.output)
+            return value
+        return print_value
+
+    elif isinstance(node, ReturnStatement):
+        return compile_node(node.expr)
+
+    elif isinstance(node, FunctionCall):
+        if node.name == "len":
+            if len(node.args) != 1:
+                # Let the interpreter report the error when it runs
+                return lambda it: it.evaluate(node)
+            return compile_node(LengthFunction(node.args[0]))
+        name = node.name
+        args = [compile_node(arg) for arg in node.args]
+        return lambda it: it.call_function(name, [arg(it) for arg in args])
+
+    elif isinstance(node, LengthFunction):
+        expr = compile_node(node.expr)
+
+        def length(it):
+            value = expr(it)
+            if isinstance(value, str) or isinstance(value, list):
+                return len(value)
+            raise TypeError("len() function only applies to strings and lists")
+        return length
+
+    elif isinstance(node, IfStatement):
+        condition = compile_node(node.condition)
+        body = compile_block(node.body)
+        else_body = compile_block(node.else_body) if node.else_body else None
+
+        def if_statement(it):
+            if condition(it):
+                return body(it)
+            return else_body(it) if else_body is not None else None
+        return if_statement
+
+    elif isinstance(node, LoopStatement):
+        return compile_loop(node)
+
+    # Declarations, input, pfor and function definitions stay interpreted
+    return lambda it: it.evaluate(node)
+
+
+def compile_binop(node):
+    """Compile a binary operation, keeping the interpreter's checks"""
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+    op = node.op
+
+    if op == '+':
+        def add(it):
+            a, b = left(it), right(it)
+            if it.max_memory is not None:
+                it.check_concat(a, b)
+            return a + b
+        return add
+    if op == '-':
+        return lambda it: left(it) - right(it)
+    if op == '*':
+        def multiply(it):
+            a, b = left(it), right(it)
+            if it.max_memory is not None:
+                it.check_repeat(a, b)
+            return a * b
+        return multiply
+    if op == '/':
+        def divide(it):
+            a, b = left(it), right(it)
+            if b == 0:
+                raise ZeroDivisionError("Division by zero")
+            return a / b
+        return divide
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        return lambda it: compare(left(it), right(it))
+    return lambda it: it.evaluate(node)
+
+
+def compile_block(statements):
+    """Compile a list of statements into a closure returning the last value"""
+    steps = [compile_node(statement) for statement in statements or []]
+    if len(steps) == 1:
+        return steps[0]
+
+    def block(it):
+        result = None
+        for step in steps:
+            result = step(it)
+        return result
+    return block
+
+
+def compile_loop(node):
+    """Compile a for loop, keeping the fuel check on its back-edge"""
+    init = compile_node(node.init)
+    condition = compile_node(node.condition)
+    update = compile_node(node.update)
+    body = compile_block(node.body)
+
+    def loop(it):
+        init(it)
+        while condition(it):
+            body(it)
+            update(it)
+            it.fuel -= 1
+            if it.fuel <= 0:
+                it.refuel()
+        return None
+    return loop
+
+
+def compile_function(func_def):
+    """Compile a function body. Statements after a top-level return never run."""
+    statements = func_def.body
+    for index, statement in enumerate(statements):
+        if isinstance(statement, ReturnStatement):
+            statements = statements[:index + 1]
+            break
+    return compile_block(statements)
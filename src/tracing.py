@@ -0,0 +1,208 @@
+import json
+import random
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+from langParser import Assignment, TypedAssignment, TypedVariable, ReturnStatement
+from langInterpreter import Interpreter
+
+PHASE_EVENTS = ('phase_start', 'phase_end')
+EXECUTION_EVENTS = ('function_enter', 'function_exit', 'statement', 'variable_write')
+EVENTS = PHASE_EVENTS + EXECUTION_EVENTS + ('error',)
+
+# Only these high-volume events are sampled, so enter/exit stay paired
+SAMPLED_EVENTS = ('statement', 'variable_write')
+
+
+class Tracer:
+    """Sends structured trace events to registered hooks.
+
+    Each event is a dict with at least 'event' and 'time' (seconds since the
+    tracer was created). Hooks are plain callables taking the event.
+
+    sample_rate -- fraction of statement and variable_write events to keep
+    functions   -- if given, only trace execution inside functions with these names
+    seed        -- seed for the sampling random generator
+    """
+
+    def __init__(self, sample_rate=1.0, functions=None, seed=None):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.functions = set(functions) if functions is not None else None
+        self.random = random.Random(seed)
+        self.hooks = []  # (hook, events) pairs
+        self.started = time.perf_counter()
+
+    def add_hook(self, hook, events=None):
+        """Register a hook for the given event names, or for all events"""
+        events = tuple(events) if events is not None else EVENTS
+        for event in events:
+            if event not in EVENTS:
+                raise ValueError(f"Unknown trace event: '{event}'")
+        self.hooks.append((hook, events))
+
+    def wants(self, event):
+        """True if any hook is registered for an event"""
+        return any(event in events for _, events in self.hooks)
+
+    @property
+    def traces_execution(self):
+        """True if the interpreter has to report function, statement or variable events"""
+        return any(self.wants(event) for event in EXECUTION_EVENTS)
+
+    def emit(self, event, **fields):
+        """Send an event to the hooks registered for it"""
+        if event in SAMPLED_EVENTS and self.sample_rate < 1.0 and self.random.random() >= self.sample_rate:
+            return
+        record = {'event': event, 'time': round(time.perf_counter() - self.started, 6)}
+        record.update(fields)
+        for hook, events in self.hooks:
+            if event in events:
+                hook(record)
+
+    def error(self, error, **fields):
+        """Emit an error event, once per exception"""
+        if getattr(error, 'lang_traced', False):
+            return
+        try:
+            error.lang_traced = True
+        except AttributeError:
+            pass
+        self.emit('error', error=type(error).__name__, message=str(error), **fields)
+
+    @contextmanager
+    def phase(self, name):
+        """Emit phase_start and phase_end (or error) around a block.
+
+        The block gets a dict whose items are added to the phase_end event.
+        """
+        self.emit('phase_start', phase=name)
+        started = time.perf_counter()
+        fields = {}
+        try:
+            yield fields
+        except Exception as e:
+            self.error(e, phase=name)
+            raise
+        self.emit('phase_end', phase=name, seconds=round(time.perf_counter() - started, 6), **fields)
+
+
+def trace_phase(tracer, name):
+    """tracer.phase(name), or a context with a throwaway dict when there is no tracer"""
+    return tracer.phase(name) if tracer is not None else nullcontext({})
+
+
+class JsonLinesSink:
+    """Hook writing each event as one line of JSON"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event, default=repr) + '\n')
+
+    def close(self):
+        """Close the stream, writing out any buffered events"""
+        self.stream.close()
+
+
+class ConsoleSink:
+    """Hook printing events in a readable form"""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __call__(self, event):
+        details = ' '.join(f"{key}={value}" for key, value in event.items() if key not in ('event', 'time'))
+        print(f"[{event['time']:10.6f}] {event['event']} {details}", file=self.stream or sys.stdout)
+
+
+class TracingInterpreter(Interpreter):
+    """Interpreter that reports execution events to a Tracer.
+
+    The plain Interpreter has no tracing code at all; this subclass is only
+    used when a hook wants execution events. Compiling hot code is disabled
+    so that every statement is seen, and so is running pfor loops on a
+    process pool, whose events would be lost.
+    """
+
+    pfor_on_pool = False
+
+    def __init__(self, tracer, **kwargs):
+        kwargs['tier_threshold'] = None
+        super().__init__(**kwargs)
+        self.tracer = tracer
+        self.call_stack = []  # Names of the running user functions
+        # Whether each level passes the function filter; the first is the top level
+        self.traced = [tracer.functions is None]
+
+    def call_function(self, name, args):
+        if name not in self.functions:
+            return super().call_function(name, args)
+        tracer = self.tracer
+        traced = tracer.functions is None or name in tracer.functions
+        self.call_stack.append(name)
+        self.traced.append(traced)
+        if traced:
+            tracer.emit('function_enter', function=name, args=args, depth=len(self.call_stack))
+        try:
+            result = super().call_function(name, args)
+        except Exception as e:
+            if traced:
+                tracer.error(e, function=name)
+            raise
+        finally:
+            self.call_stack.pop()
+            self.traced.pop()
+        if traced:
+            tracer.emit('function_exit', function=name, result=result, depth=len(self.call_stack) + 1)
+        return result
+
+    def current_function(self):
+        return self.call_stack[-1] if self.call_stack else None
+
+    def trace_statement(self, statement):
+        if self.traced[-1]:
+            self.tracer.emit('statement', function=self.current_function(), node=type(statement).__name__)
+
+    def evaluate(self, node):
+        result = super().evaluate(node)
+        if self.traced[-1] and isinstance(node, (Assignment, TypedAssignment, TypedVariable)):
+            self.tracer.emit('variable_write', function=self.current_function(),
+                             name=node.name, value=self.variables[node.name])
+        return result
+
+    def execute_function_body(self, statements):
+        result = None
+        for statement in statements:
+            self.trace_statement(statement)
+            result = self.evaluate(statement)
+            if isinstance(statement, ReturnStatement):
+                break
+        return result
+
+    def execute_block(self, statements):
+        if statements is None:
+            return None
+        result = None
+        for statement in statements:
+            self.trace_statement(statement)
+            result = self.evaluate(statement)
+        return result
+
+    def run(self, ast):
+        self.reset_fuel()
+        result = None
+        for node in ast:
+            self.trace_statement(node)
+            result = self.evaluate(node)
+        return result
+
+
+def make_interpreter(tracer=None, **kwargs):
+    """An Interpreter, traced only if the tracer has hooks for execution events"""
+    if tracer is not None and tracer.traces_execution:
+        return TracingInterpreter(tracer, **kwargs)
+    return Interpreter(**kwargs)